@@ -1,16 +1,33 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
 import json
+import asyncio
+import re
+import bisect
+import unicodedata
+import logging
+import queue
+import atexit
 import random
 import mimetypes
+import time
+import threading
+import functools
+import inspect
+from array import array
+from collections import Counter, deque
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
 from mutagen.mp3 import MP3
-from mutagen.id3 import ID3NoHeaderError
+from mutagen.id3 import ID3, ID3NoHeaderError
 from pathlib import Path
 import os
 import sys
 import socket
+import ipaddress
 from dotenv import load_dotenv
 import ssl
 
@@ -23,23 +40,175 @@ if venv_site_packages.exists():
 env_path = Path(__file__).parent / ".env"
 load_dotenv(env_path)
 
-print(f"Python: {sys.executable}")
-print(f"Python version: {sys.version}")
-print(f"Site-packages: {venv_site_packages}")
-print(f"Loading .env from: {env_path}")
+# --- Logging
+# Les appels de log ne font que poser le record dans une queue bornée:
+# formatage (JSON) et écriture stdout/journald se font sur le thread du
+# QueueListener, jamais sur le chemin requête / WebSocket.
+# Les args sont formatés plus tard: ne passer que des valeurs immuables.
+LOG_LEVEL = os.getenv("GLOBE_LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.getenv("GLOBE_LOG_JSON", "1") == "1"
+LOG_QUEUE_SIZE = int(os.getenv("GLOBE_LOG_QUEUE_SIZE", "10000"))
+# "<logger>=<records/s>,..." et "<logger>=<ratio 0..1>,..." (WARNING+ jamais limités)
+LOG_RATE = os.getenv("GLOBE_LOG_RATE", "globe.spotify=5,globe.search=5")
+LOG_SAMPLE = os.getenv("GLOBE_LOG_SAMPLE", "")
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextLogFormatter(logging.Formatter):
+    """Plain-text lines (GLOBE_LOG_JSON=0), structured fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            extra = " ".join(f"{k}={json.dumps(v, ensure_ascii=False, default=str)}" for k, v in fields.items())
+            first, sep, rest = line.partition("\n")
+            line = f"{first} {extra}{sep}{rest}"
+        return line
+
+class LogRateLimit(logging.Filter):
+    """Per-logger sampling and token-bucket rate limit; WARNING and above always pass."""
+
+    def __init__(self, rate: float | None = None, sample: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.sample = sample
+        self.tokens = rate or 0.0
+        self.last = time.monotonic()
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample < 1.0 and random.random() >= self.sample:
+            with self.lock:
+                self.dropped += 1
+            return False
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return False
+            self.tokens -= 1
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue the raw record; drop (and count) instead of blocking when the queue is full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+        self.drop_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Pas de self.format() ici: le formatage est fait par le listener.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+
+def parse_log_spec(spec: str) -> dict[str, float]:
+    out = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        try:
+            out[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return out
+
+# références pour exposer les compteurs de records perdus (voir /api/admin/profiling)
+log_drops = {"queue": None, "filters": {}}
+
+def log_drop_counts() -> dict:
+    return {
+        "queue_full": log_drops["queue"].dropped if log_drops["queue"] else 0,
+        "rate_limited": {name: f.dropped for name, f in log_drops["filters"].items()},
+    }
+
+def setup_logging() -> QueueListener:
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonLogFormatter() if LOG_JSON else TextLogFormatter())
+    listener = QueueListener(queue.Queue(maxsize=LOG_QUEUE_SIZE), stream, respect_handler_level=True)
+
+    root = logging.getLogger("globe")
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    log_drops["queue"] = DroppingQueueHandler(listener.queue)
+    root.addHandler(log_drops["queue"])
+
+    rates = parse_log_spec(LOG_RATE)
+    samples = parse_log_spec(LOG_SAMPLE)
+    for name in rates.keys() | samples.keys():
+        log_drops["filters"][name] = LogRateLimit(rates.get(name), samples.get(name, 1.0))
+        logging.getLogger(name).addFilter(log_drops["filters"][name])
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = setup_logging()
+log = logging.getLogger("globe")
+spotify_log = logging.getLogger("globe.spotify")
+search_log = logging.getLogger("globe.search")
+
+log.info("Python: %s (%s)", sys.executable, sys.version.split()[0])
+log.debug("Site-packages: %s", venv_site_packages)
+log.info("Loading .env from: %s", env_path)
 
 try:
     import spotipy
+    import requests
     from spotipy.oauth2 import SpotifyOAuth
     SPOTIFY_AVAILABLE = True
-    print("✓ Spotipy imported successfully")
+    log.info("Spotipy imported successfully")
 except Exception as e:
     SPOTIFY_AVAILABLE = False
-    print(f"✗ Failed to import spotipy: {e}")
-    import traceback
-    traceback.print_exc()
+    log.exception("Failed to import spotipy: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm restart: l'état restauré et sa piste sont prêts avant "startup complete"
+    restore_state_snapshot()
+    try:
+        await asyncio.wait_for(asyncio.to_thread(prewarm_current_track), timeout=PREWARM_TIMEOUT)
+    except asyncio.TimeoutError:
+        log.warning("Pre-warm timed out after %ss", PREWARM_TIMEOUT)
+    except Exception as e:
+        # best-effort: un likes.json ou un mp3 illisible ne doit pas empêcher le démarrage
+        log.warning("Pre-warm failed: %s", e)
+    start_state_snapshots()
+    start_local_indexer()
+    yield
+    stop_local_indexer()
+    stop_state_snapshots()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 def get_lan_ip() -> str | None:
     try:
@@ -68,6 +237,164 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Profiling (opt-in)
+# Spans: timing par requête autour des fonctions chaudes, les requêtes lentes
+# sont gardées dans un ring buffer. Sampler: pile de tous les threads toutes
+# les N ms, agrégée au format "collapsed stacks" (flamegraph.pl / speedscope).
+PROFILE_SLOW_MS = float(os.getenv("GLOBE_PROFILE_SLOW_MS", "200"))
+PROFILE_TRACE_BUFFER = int(os.getenv("GLOBE_PROFILE_TRACE_BUFFER", "50"))
+ADMIN_TOKEN = os.getenv("GLOBE_ADMIN_TOKEN", "")
+
+profiling = {
+    "spans": os.getenv("GLOBE_PROFILE_SPANS", "0") == "1",
+    "slow_ms": PROFILE_SLOW_MS,
+}
+slow_traces: deque = deque(maxlen=PROFILE_TRACE_BUFFER)
+current_span: ContextVar[dict | None] = ContextVar("current_span", default=None)
+
+@contextmanager
+def span(name: str):
+    """Time a block as a child of the current request span (no-op outside a traced request)."""
+    parent = current_span.get()
+    if parent is None:
+        yield
+        return
+
+    node = {"name": name, "start": time.perf_counter(), "children": []}
+    parent["children"].append(node)
+    token = current_span.set(node)
+    try:
+        yield
+    finally:
+        node["duration_ms"] = (time.perf_counter() - node["start"]) * 1000
+        current_span.reset(token)
+
+def traced(fn):
+    """Wrap a sync or async function in a span named after it."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with span(fn.__name__):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def span_tree(node: dict, t0: float) -> dict:
+    """Convert raw perf_counter starts to offsets (ms) relative to the request start."""
+    return {
+        "name": node["name"],
+        "offset_ms": round((node["start"] - t0) * 1000, 3),
+        "duration_ms": round(node["duration_ms"], 3) if "duration_ms" in node else None,
+        "children": [span_tree(c, t0) for c in node["children"]],
+    }
+
+class ProfileRequestsMiddleware:
+    """
+    Middleware ASGI pur: quand le timing des spans est désactivé, la requête
+    passe tout droit (pas de wrapper sur le body, ex. FileResponse audio).
+    La durée mesurée va jusqu'à l'envoi des headers de la réponse.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling["spans"]:
+            await self.app(scope, receive, send)
+            return
+
+        root = {"name": f"{scope['method']} {scope['path']}", "start": time.perf_counter(), "children": []}
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start" and "duration_ms" not in root:
+                root["duration_ms"] = (time.perf_counter() - root["start"]) * 1000
+            await send(message)
+
+        token = current_span.set(root)
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            current_span.reset(token)
+            root.setdefault("duration_ms", (time.perf_counter() - root["start"]) * 1000)
+            if root["duration_ms"] >= profiling["slow_ms"]:
+                trace = span_tree(root, root["start"])
+                trace["at"] = time.time()
+                slow_traces.append(trace)
+
+app.add_middleware(ProfileRequestsMiddleware)
+
+sampler = {
+    "thread": None,
+    "stop": None,
+    "interval_ms": 5.0,
+    "samples": Counter(),
+    "count": 0,
+    "started_at": None,
+}
+sampler_lock = threading.Lock()
+
+def sampler_loop(stop: threading.Event, interval: float):
+    own = threading.get_ident()
+    while not stop.wait(interval):
+        stacks = []
+        for tid, frame in sys._current_frames().items():
+            if tid == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stacks.append(";".join(reversed(stack)))
+        with sampler_lock:
+            sampler["samples"].update(stacks)
+            sampler["count"] += 1
+
+def start_sampler(interval_ms: float) -> bool:
+    if sampler["thread"] is not None:
+        return False
+    stop = threading.Event()
+    with sampler_lock:
+        sampler["samples"] = Counter()
+        sampler["count"] = 0
+    sampler["interval_ms"] = interval_ms
+    sampler["started_at"] = time.time()
+    sampler["stop"] = stop
+    sampler["thread"] = threading.Thread(
+        target=sampler_loop, args=(stop, interval_ms / 1000), name="globe-sampler", daemon=True
+    )
+    sampler["thread"].start()
+    return True
+
+def stop_sampler() -> bool:
+    thread = sampler["thread"]
+    if thread is None:
+        return False
+    sampler["stop"].set()
+    thread.join(timeout=1)
+    sampler["thread"] = None
+    sampler["stop"] = None
+    return True
+
+def admin_denied(request: Request, token: str | None) -> JSONResponse | None:
+    """Avec GLOBE_ADMIN_TOKEN: le token est exigé. Sans: uniquement depuis la machine elle-même."""
+    if ADMIN_TOKEN:
+        if token != ADMIN_TOKEN:
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        return None
+    host = request.client.host if request.client else ""
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return None
+    except ValueError:
+        pass
+    return JSONResponse({"error": "forbidden"}, status_code=403)
+
 # Spotify configuration
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID", "711d2c87130243d6b5acc63a6f991846")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET", "")
@@ -103,10 +430,10 @@ def get_spotify_redirect_uri():
 
 SPOTIFY_REDIRECT_URI = get_spotify_redirect_uri()
 
-print(f"Spotify Client ID: {SPOTIFY_CLIENT_ID[:20]}...")
-print(f"Spotify Client Secret: {'SET' if SPOTIFY_CLIENT_SECRET else 'NOT SET'}")
-print(f"Spotify Redirect URI: {SPOTIFY_REDIRECT_URI}")
-print(f"Detected LAN IP: {get_lan_ip() or 'Not detected (using fallback)'}")
+log.info("Spotify Client ID: %s...", SPOTIFY_CLIENT_ID[:20])
+log.info("Spotify Client Secret: %s", "SET" if SPOTIFY_CLIENT_SECRET else "NOT SET")
+log.info("Spotify Redirect URI: %s", SPOTIFY_REDIRECT_URI)
+log.info("Detected LAN IP: %s", get_lan_ip() or "Not detected (using fallback)")
 
 # Spotify auth manager (only if available)
 spotify_oauth = None
@@ -119,23 +446,29 @@ if SPOTIFY_AVAILABLE:
             scope="user-read-playback-state,user-modify-playback-state,streaming,user-read-email,user-read-private",
             cache_path=".spotify_cache"
         )
-        print("✓ Spotify OAuth initialized successfully")
+        log.info("Spotify OAuth initialized successfully")
     except Exception as e:
-        print(f"✗ Failed to initialize Spotify OAuth: {e}")
+        log.error("Failed to initialize Spotify OAuth: %s", e)
         SPOTIFY_AVAILABLE = False
 else:
-    print("✗ Spotify not available")
+    log.warning("Spotify not available")
 
 # Global Spotify client (will be set after auth)
 spotify_client = None
 spotify_user_token = None
 
+# Search: Spotify renvoie au plus 10 résultats par appel pour ce niveau d'accès,
+# les pages sont demandées en parallèle (session partagée = connexions keep-alive).
+SPOTIFY_SEARCH_PAGE_SIZE = 10
+SPOTIFY_SEARCH_MAX_RESULTS = 50
+spotify_http = requests.Session() if SPOTIFY_AVAILABLE else None
+
 def get_spotify_client():
     """Get or create Spotify client with proper token handling"""
     global spotify_user_token
     
     if not SPOTIFY_AVAILABLE or not spotify_oauth:
-        print("Spotify not available")
+        spotify_log.debug("Spotify not available")
         return None
     
     try:
@@ -143,15 +476,14 @@ def get_spotify_client():
         token = spotify_oauth.get_cached_token()
         
         if not token:
-            print("No cached token found - user not authenticated")
+            spotify_log.info("No cached token found - user not authenticated")
             return None
         
         if "access_token" not in token:
-            print("Token missing access_token field")
+            spotify_log.warning("Token missing access_token field")
             return None
         
         access_token = token["access_token"]
-        print(f"Using access token (first 20 chars): {access_token[:20]}...")
         spotify_user_token = token
         
         # Create client with the access token directly
@@ -159,11 +491,10 @@ def get_spotify_client():
         return spotipy.Spotify(auth=access_token)
         
     except Exception as e:
-        print(f"Error getting Spotify client: {e}")
-        import traceback
-        traceback.print_exc()
+        spotify_log.exception("Error getting Spotify client: %s", e)
         return None
 
+@traced
 def add_track_to_globe_likes(track_uri: str) -> bool:
     if not track_uri:
         return False
@@ -206,7 +537,7 @@ def add_track_to_globe_likes(track_uri: str) -> bool:
         sp.playlist_add_items(playlist_id, [track_uri])
         return True
     except Exception as e:
-        print(f"Failed to add track to Globe likes: {e}")
+        spotify_log.error("Failed to add track to Globe likes: %s", e)
         return False
 
 DATA_DIR = Path(__file__).parent / "data"
@@ -218,11 +549,13 @@ COVERS_DIR.mkdir(exist_ok=True)
 # --- Musique locale (simule carte SD)
 MUSIC_DIR = Path(__file__).parent / "music"
 
+@traced
 def load_likes() -> dict:
     if LIKES_FILE.exists():
         return json.loads(LIKES_FILE.read_text(encoding="utf-8"))
     return {}
 
+@traced
 def save_likes(likes: dict):
     LIKES_FILE.write_text(json.dumps(likes, indent=2), encoding="utf-8")
 
@@ -237,6 +570,7 @@ def read_sidecar_json(mp3_path: Path) -> dict | None:
         return None
 
 
+@traced
 def read_id3_meta(mp3_path: Path) -> dict:
     """
     Retourne dict {artist, title, cover_cached: bool}
@@ -284,6 +618,24 @@ def read_id3_meta(mp3_path: Path) -> dict:
     return meta
 
 
+def read_id3_tags(mp3_path: Path) -> dict:
+    """
+    Artist / title seulement (pas d'extraction de cover ni de scan des frames MPEG),
+    utilisé par l'index de recherche locale.
+    """
+    try:
+        tags = ID3(mp3_path)
+    except Exception:
+        return {}
+
+    meta = {}
+    for key, frame_id in (("artist", "TPE1"), ("title", "TIT2")):
+        frame = tags.get(frame_id)
+        if frame and getattr(frame, "text", None):
+            meta[key] = str(frame.text[0])
+    return meta
+
+
 def cover_url_for_track(country: str, decade: str, mp3_path: Path, sidecar: dict | None) -> str:
     """
     Priorité:
@@ -316,9 +668,156 @@ state = {
     "liked": False,
 }
 
+# --- Persistance de l'état
+# Snapshot JSON de `state` (quelques centaines d'octets) écrit de façon atomique:
+# fichier temporaire + fsync + os.replace, donc jamais de fichier à moitié écrit.
+# Écrit après chaque broadcast d'état (regroupé sur STATE_SNAPSHOT_DEBOUNCE) et
+# toutes les STATE_SNAPSHOT_INTERVAL secondes, seulement si le contenu a changé.
+STATE_FILE = DATA_DIR / "state.json"
+STATE_SNAPSHOT_INTERVAL = float(os.getenv("GLOBE_STATE_SNAPSHOT_INTERVAL", "30"))
+STATE_SNAPSHOT_DEBOUNCE = 0.5
+PREWARM_TIMEOUT = float(os.getenv("GLOBE_PREWARM_TIMEOUT", "3"))
+PREWARM_AUDIO_BYTES = 256 * 1024
+
+state_snapshots = {"thread": None, "stop": None, "wake": threading.Event(), "last": None}
+state_snapshot_lock = threading.Lock()
+
+def save_state_snapshot() -> bool:
+    with state_snapshot_lock:
+        data = json.dumps(dict(state), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if data == state_snapshots["last"]:
+            return False
+        tmp = STATE_FILE.with_suffix(".json.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, STATE_FILE)
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(STATE_FILE.parent, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        state_snapshots["last"] = data
+        return True
+
+def restore_state_snapshot() -> bool:
+    if not STATE_FILE.exists():
+        return False
+    try:
+        data = STATE_FILE.read_bytes()
+        saved = json.loads(data)
+    except Exception as e:
+        log.warning("Ignoring unreadable state snapshot %s: %s", STATE_FILE, e)
+        return False
+    if not isinstance(saved, dict):
+        return False
+
+    # uniquement les clés connues, avec le type du placeholder
+    for k, v in saved.items():
+        if k in state and isinstance(v, type(state[k])):
+            state[k] = v
+    state_snapshots["last"] = data
+    log.info("State restored", extra={"fields": {"trackId": state["trackId"], "source": state["source"]}})
+    return True
+
+def local_path_from_url(url: str) -> Path | None:
+    """/api/audio|cover/<country>/<decade>/<file> ou /api/cover_cached/<file> -> fichier local"""
+    # "/api/audio/<country>/<decade>/<file>".split("/") => ["", "api", "audio", country, decade, file]
+    parts = url.split("/")
+    if len(parts) == 6 and parts[2] in ("audio", "cover"):
+        root = MUSIC_DIR
+        path = MUSIC_DIR / parts[3] / parts[4] / Path(parts[5]).name
+    elif len(parts) == 4 and parts[2] == "cover_cached":
+        root = COVERS_DIR
+        path = COVERS_DIR / Path(parts[3]).name
+    else:
+        return None
+    path = path.resolve()
+    if not str(path).startswith(str(root.resolve())) or not path.exists():
+        return None
+    return path
+
+def prewarm_current_track():
+    """Charge en cache (page cache + caches de l'app) ce dont la 1re requête du kiosk aura besoin."""
+    t0 = time.perf_counter()
+    mp3 = None
+    if state["source"] == "local":
+        mp3 = local_path_from_url(state["streamUrl"]) if state["streamUrl"] else None
+        if mp3 is None:
+            # le MP3 du snapshot a disparu (supprimé, renommé, MUSIC_DIR changé): on en tire un autre
+            previous = state["trackId"]
+            set_track_from_fs(state["country"], state["decade"])
+            log.warning(
+                "Restored track missing, replaced",
+                extra={"fields": {"previous": previous, "trackId": state["trackId"], "country": state["country"], "decade": state["decade"]}},
+            )
+            mp3 = local_path_from_url(state["streamUrl"]) if state["streamUrl"] else None
+
+    try:
+        likes = load_likes()
+        state["liked"] = bool(likes.get(state["trackId"], False))
+    except Exception as e:
+        log.warning("Pre-warm: could not read likes: %s", e)
+
+    if state["source"] == "local":
+        pick_track_path(state["country"], state["decade"])
+        if mp3:
+            read_sidecar_json(mp3)
+            read_id3_meta(mp3)  # extrait la cover embarquée si elle n'est pas encore en cache
+            with open(mp3, "rb") as f:
+                f.read(PREWARM_AUDIO_BYTES)
+        cover = local_path_from_url(state["coverUrl"]) if state["coverUrl"] else None
+        if cover:
+            cover.read_bytes()
+
+    log.info(
+        "Pre-warm done",
+        extra={"fields": {"trackId": state["trackId"], "ms": round((time.perf_counter() - t0) * 1000, 1)}},
+    )
+
+def state_snapshot_loop(stop: threading.Event):
+    wake = state_snapshots["wake"]
+    while not stop.is_set():
+        if wake.wait(STATE_SNAPSHOT_INTERVAL):
+            stop.wait(STATE_SNAPSHOT_DEBOUNCE)
+            wake.clear()
+        try:
+            save_state_snapshot()
+        except Exception as e:
+            log.error("Failed to write state snapshot: %s", e)
+
+def start_state_snapshots():
+    if state_snapshots["thread"] is not None:
+        return
+    stop = threading.Event()
+    state_snapshots["stop"] = stop
+    state_snapshots["thread"] = threading.Thread(
+        target=state_snapshot_loop, args=(stop,), name="globe-state-snapshots", daemon=True
+    )
+    state_snapshots["thread"].start()
+
+def stop_state_snapshots():
+    thread = state_snapshots["thread"]
+    if thread is None:
+        return
+    state_snapshots["stop"].set()
+    state_snapshots["wake"].set()
+    thread.join(timeout=2)
+    state_snapshots["thread"] = None
+    try:
+        save_state_snapshot()
+    except Exception as e:
+        log.error("Failed to write state snapshot: %s", e)
+
 clients: set[WebSocket] = set()
 
+@traced
 async def broadcast(msg: dict):
+    if msg.get("type") == "state":
+        # tout changement d'état passe par ici: on déclenche un snapshot
+        state_snapshots["wake"].set()
     dead = []
     for ws in clients:
         try:
@@ -345,11 +844,16 @@ class PatchReq(BaseModel):
 class SpotifySearchReq(BaseModel):
     query: str
     limit: int | None = 20
+    offset: int | None = 0
 
 class SpotifyPlayReq(BaseModel):
     uri: str
     device_id: str | None = None
 
+class ProfilingReq(BaseModel):
+    spans: bool | None = None
+    slow_ms: float | None = None
+
 def pick_track_path(country: str, decade: str) -> Path | None:
     folder = MUSIC_DIR / country / decade
     if not folder.exists():
@@ -359,6 +863,7 @@ def pick_track_path(country: str, decade: str) -> Path | None:
         return None
     return random.choice(tracks)
 
+@traced
 def set_track_from_fs(country: str, decade: str):
     p = pick_track_path(country, decade)
     if not p:
@@ -394,6 +899,458 @@ def set_track_from_fs(country: str, decade: str):
     state["streamUrl"] = f"/api/audio/{country}/{decade}/{p.name}"
     state["coverUrl"] = cover_url
 
+# --- Recherche locale
+# Index en mémoire sur MUSIC_DIR/<country>/<decade>/*.mp3 (sidecar JSON > ID3 > nom de fichier,
+# comme set_track_from_fs). Postings en array('I') pour tenir 100k pistes sur un Pi:
+#   - postings séparés titre/artiste ("main") et pays/décennie ("meta"), pour collecter
+#     les candidats du meilleur au moins bon type de match avant de les classer
+#   - vocab trié + bisect => plage des tokens qui commencent par un préfixe
+#   - bitmaps (int Python, bit i = doc id i) pour les préfixes de 1-2 caractères:
+#     les termes se combinent avec & / | côté C au lieu de tester chaque doc en Python
+#   - trigrammes => candidats pour les recherches "sous-chaîne" (ex. "70s" dans "1970s")
+# Mise à jour incrémentale: une piste modifiée reçoit un nouveau doc id, l'ancien
+# reste dans les postings jusqu'au prochain rebuild et est ignoré à la lecture.
+# Les gros lots (1er scan, beaucoup de changements) sont indexés hors du lock puis échangés.
+LOCAL_INDEX_INTERVAL = float(os.getenv("GLOBE_LOCAL_INDEX_INTERVAL", "60"))
+LOCAL_SEARCH_CANDIDATES = 200
+LOCAL_REBUILD_BATCH = 1000
+LOCAL_SHORT_PREFIX = 2
+LOCAL_LAZY_POSTINGS = 5000  # au-delà, un préfixe long est approché par le bitmap de ses 2 1ers caractères
+LOCAL_SCAN_LIMIT = 5000     # docs examinés au plus par requête
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+LOCAL_FIELD_WEIGHTS = {"title": 3.0, "artist": 3.0, "country": 1.5, "decade": 1.0}
+LOCAL_POSTING_GROUPS = {"main": ("title", "artist"), "meta": ("country", "decade")}
+
+local_index = {
+    "docs": {},       # doc id -> piste (+ "fields", "tokens", "text")
+    "paths": {},      # chemin mp3 -> (signature, doc id ou None si illisible)
+    "postings": {group: {} for group in LOCAL_POSTING_GROUPS},  # groupe -> token -> array de doc ids
+    "vocab": [],      # tokens triés (tous groupes)
+    "trigrams": {group: {} for group in LOCAL_POSTING_GROUPS},  # groupe -> trigramme -> array
+    "short": {group: {} for group in LOCAL_POSTING_GROUPS},     # groupe -> préfixe 1-2 car. -> bitmap
+    "meta_bits": {},  # token pays/décennie -> bitmap (vocabulaire minuscule, tout est précalculé)
+    "next_id": 0,
+    "stale": 0,
+    "built_at": None,
+    "build_ms": None,
+}
+local_index_lock = threading.Lock()
+local_refresh_lock = threading.Lock()
+local_indexer = {"thread": None, "stop": None, "wake": threading.Event()}
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+def trigrams_of(token: str) -> set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+def sidecar_text(value) -> str | None:
+    """Valeur texte d'un champ sidecar ("title": 1999 => "1999"), None sinon."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+def scan_music_dir() -> dict[str, tuple]:
+    """chemin mp3 -> (country, decade, signature), signature = mtimes/taille mp3 + sidecar"""
+    found = {}
+    if not MUSIC_DIR.exists():
+        return found
+    for country_dir in os.scandir(MUSIC_DIR):
+        if not country_dir.is_dir():
+            continue
+        for decade_dir in os.scandir(country_dir.path):
+            if not decade_dir.is_dir():
+                continue
+            entries = {e.name: e for e in os.scandir(decade_dir.path)}
+            for name, entry in entries.items():
+                if not name.endswith(".mp3") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                sidecar = entries.get(name[:-4] + ".json")
+                sidecar_mtime = sidecar.stat().st_mtime_ns if sidecar else 0
+                found[entry.path] = (country_dir.name, decade_dir.name, (st.st_mtime_ns, st.st_size, sidecar_mtime))
+    return found
+
+def read_local_track(country: str, decade: str, p: Path) -> dict:
+    sidecar = read_sidecar_json(p)
+    if not isinstance(sidecar, dict):
+        sidecar = {}
+    artist = sidecar_text(sidecar.get("artist"))
+    title = sidecar_text(sidecar.get("title"))
+    if not artist or not title:
+        tags = read_id3_tags(p)
+        artist = artist or tags.get("artist")
+        title = title or tags.get("title")
+
+    track = {
+        "trackId": f"{country}-{decade}-{p.stem}",
+        "artist": artist or "—",
+        "title": title or p.stem,
+        "country": country,
+        "decade": decade,
+        "file": p.name,
+        "cover": sidecar_text(sidecar.get("cover")),
+        "streamUrl": f"/api/audio/{country}/{decade}/{p.name}",
+    }
+    # " tok tok " : préfixe = " " + terme, mot exact = " " + terme + " " (tests `in` côté C)
+    fields = {f: normalize_text(track[f]) for f in LOCAL_FIELD_WEIGHTS}
+    track["fields"] = {f: f" {text} " for f, text in fields.items()}
+    track["tokens"] = tuple(dict.fromkeys(" ".join(fields.values()).split()))
+    track["text"] = " " + " ".join(track["tokens"]) + " "
+    track["groups"] = {
+        group: tuple(dict.fromkeys(" ".join(fields[f] for f in names).split()))
+        for group, names in LOCAL_POSTING_GROUPS.items()
+    }
+    return track
+
+def add_local_postings(postings: dict, trigrams: dict, doc_id: int, doc: dict) -> set[str]:
+    """Ajoute doc_id aux postings / trigrammes, retourne les tokens vus pour la 1re fois dans un groupe."""
+    new_tokens = set()
+    for group, tokens in doc["groups"].items():
+        group_postings = postings[group]
+        group_trigrams = trigrams[group]
+        grams = set()
+        for token in tokens:
+            plist = group_postings.get(token)
+            if plist is None:
+                plist = group_postings[token] = array("I")
+                new_tokens.add(token)
+            plist.append(doc_id)
+            grams |= trigrams_of(token)
+        for g in grams:
+            plist = group_trigrams.get(g)
+            if plist is None:
+                plist = group_trigrams[g] = array("I")
+            plist.append(doc_id)
+    return new_tokens
+
+def short_prefixes(tokens) -> set[str]:
+    return {token[:n] for token in tokens for n in range(1, LOCAL_SHORT_PREFIX + 1)}
+
+def build_local_index(docs: dict) -> dict:
+    """Postings, vocab, trigrammes et bitmaps des préfixes courts pour `docs` (hors lock)."""
+    postings = {group: {} for group in LOCAL_POSTING_GROUPS}
+    trigrams = {group: {} for group in LOCAL_POSTING_GROUPS}
+    vocab = set()
+    size = (max(docs, default=0) >> 3) + 1
+    short_bufs = {group: {} for group in LOCAL_POSTING_GROUPS}
+    for doc_id in sorted(docs):
+        doc = docs[doc_id]
+        vocab |= add_local_postings(postings, trigrams, doc_id, doc)
+        byte, bit = doc_id >> 3, 1 << (doc_id & 7)
+        for group, bufs in short_bufs.items():
+            for p in short_prefixes(doc["groups"][group]):
+                buf = bufs.get(p)
+                if buf is None:
+                    buf = bufs[p] = bytearray(size)
+                buf[byte] |= bit
+    short = {
+        group: {p: int.from_bytes(buf, "little") for p, buf in bufs.items()}
+        for group, bufs in short_bufs.items()
+    }
+    meta_bits = {token: bits_from_postings([plist], size) for token, plist in postings["meta"].items()}
+    return {"postings": postings, "vocab": sorted(vocab), "trigrams": trigrams, "short": short, "meta_bits": meta_bits}
+
+def refresh_local_index() -> dict:
+    """Re-scan MUSIC_DIR and (re)index only new/changed tracks, drop removed ones."""
+    if not local_refresh_lock.acquire(blocking=False):
+        return {"skipped": True}
+    try:
+        t0 = time.perf_counter()
+        found = scan_music_dir()
+        known = local_index["paths"]
+        removed = [path for path in known if path not in found]
+        changed = [path for path, (_, _, sig) in sorted(found.items()) if known.get(path, (None,))[0] != sig]
+
+        # I/O (sidecar + ID3) hors du lock: les recherches continuent pendant le scan.
+        # Un fichier illisible est gardé avec doc id None: réessayé seulement s'il change.
+        new_docs = {}
+        failed = 0
+        dropped_ids = set()
+        for path in removed + changed:
+            old = known.pop(path, None)
+            if old and old[1] is not None:
+                dropped_ids.add(old[1])
+        for path in changed:
+            country, decade, sig = found[path]
+            try:
+                doc = read_local_track(country, decade, Path(path))
+            except Exception as e:
+                log.warning("Skipping unreadable track %s: %s", path, e)
+                known[path] = (sig, None)
+                failed += 1
+                continue
+            doc_id = local_index["next_id"]
+            local_index["next_id"] += 1
+            new_docs[doc_id] = doc
+            known[path] = (sig, doc_id)
+
+        # seul ce thread modifie l'index: les lectures hors lock ci-dessous sont sûres
+        stale = local_index["stale"] + len(dropped_ids)
+        if len(new_docs) > LOCAL_REBUILD_BATCH or stale > max(LOCAL_REBUILD_BATCH, len(local_index["docs"]) // 2):
+            # gros lot: reconstruit tout hors du lock, puis échange
+            docs = {i: d for i, d in local_index["docs"].items() if i not in dropped_ids}
+            docs.update(new_docs)
+            built = build_local_index(docs)
+            with local_index_lock:
+                local_index.update(built, docs=docs, stale=0)
+        elif new_docs or dropped_ids:
+            # bitmaps: ints immuables, on prépare la nouvelle version hors lock
+            short = {group: dict(bits) for group, bits in local_index["short"].items()}
+            meta_bits = dict(local_index["meta_bits"])
+            for doc_id, doc in new_docs.items():
+                bit = 1 << doc_id
+                for group, bits in short.items():
+                    for p in short_prefixes(doc["groups"][group]):
+                        bits[p] = bits.get(p, 0) | bit
+                for token in doc["groups"]["meta"]:
+                    meta_bits[token] = meta_bits.get(token, 0) | bit
+            with local_index_lock:
+                local_index["short"] = short
+                local_index["meta_bits"] = meta_bits
+                docs = local_index["docs"]
+                for doc_id in dropped_ids:
+                    docs.pop(doc_id, None)
+                new_tokens = set()
+                for doc_id, doc in new_docs.items():
+                    new_tokens |= add_local_postings(local_index["postings"], local_index["trigrams"], doc_id, doc)
+                    docs[doc_id] = doc
+                vocab = local_index["vocab"]
+                missing = sorted(t for t in new_tokens if not local_vocab_has(vocab, t))
+                if missing:
+                    # deux suites triées: timsort les fusionne en O(V)
+                    local_index["vocab"] = sorted(vocab + missing)
+                local_index["stale"] = stale
+        local_index["built_at"] = time.time()
+        local_index["build_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        if changed or removed:
+            log.info(
+                "Local index refreshed",
+                extra={"fields": {
+                    "tracks": len(local_index["docs"]),
+                    "changed": len(changed),
+                    "removed": len(removed),
+                    "failed": failed,
+                    "build_ms": local_index["build_ms"],
+                }},
+            )
+        return {"changed": len(changed), "removed": len(removed), "failed": failed}
+    finally:
+        local_refresh_lock.release()
+
+def local_indexer_loop(stop: threading.Event):
+    while not stop.is_set():
+        try:
+            refresh_local_index()
+        except Exception as e:
+            log.exception("Local index refresh failed: %s", e)
+        local_indexer["wake"].wait(LOCAL_INDEX_INTERVAL)
+        local_indexer["wake"].clear()
+
+def start_local_indexer():
+    if local_indexer["thread"] is not None:
+        return
+    stop = threading.Event()
+    local_indexer["stop"] = stop
+    local_indexer["thread"] = threading.Thread(
+        target=local_indexer_loop, args=(stop,), name="globe-local-indexer", daemon=True
+    )
+    local_indexer["thread"].start()
+
+def stop_local_indexer():
+    if local_indexer["thread"] is None:
+        return
+    local_indexer["stop"].set()
+    local_indexer["wake"].set()
+    local_indexer["thread"] = None
+
+def local_vocab_has(vocab: list, token: str) -> bool:
+    i = bisect.bisect_left(vocab, token)
+    return i < len(vocab) and vocab[i] == token
+
+def bits_from_postings(plists, size: int) -> int:
+    buf = bytearray(size)
+    for plist in plists:
+        for doc_id in plist:
+            buf[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(buf, "little")
+
+def iter_bits(bits: int):
+    """Doc ids des bits à 1, croissants (les octets nuls sont sautés par la regex, côté C)."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for m in NONZERO_BYTE.finditer(data):
+        byte = data[m.start()]
+        base = m.start() << 3
+        while byte:
+            low = byte & -byte
+            yield base + low.bit_length() - 1
+            byte ^= low
+
+def local_term_bits(term: str, size: int) -> tuple[int, int, int, bool]:
+    """
+    Bitmaps des docs qui matchent `term`: (token exact en titre/artiste, préfixe en
+    titre/artiste, préfixe en pays/décennie, à vérifier). "À vérifier" = préfixe
+    trop fréquent en titre/artiste, approché par le bitmap de ses 2 premiers caractères.
+    """
+    short = local_index["short"]
+    main_postings = local_index["postings"]["main"]
+    exact_list = main_postings.get(term)
+    if exact_list is None:
+        exact = 0
+    elif len(exact_list) <= LOCAL_LAZY_POSTINGS:
+        exact = bits_from_postings([exact_list], size)
+    else:
+        exact = None
+
+    if len(term) <= LOCAL_SHORT_PREFIX:
+        main = short["main"].get(term, 0)
+        return (main if exact is None else exact), main, short["meta"].get(term, 0), False
+
+    # expansion paresseuse de la plage du vocab (quelques dizaines de tokens pour 3+ caractères)
+    vocab = local_index["vocab"]
+    meta_bits = local_index["meta_bits"]
+    lo = bisect.bisect_left(vocab, term)
+    hi = bisect.bisect_left(vocab, term + "\uffff", lo)
+    main_lists = []
+    volume = 0
+    meta = 0
+    for i in range(lo, hi):
+        token = vocab[i]
+        bits = meta_bits.get(token)
+        if bits:
+            meta |= bits
+        plist = main_postings.get(token)
+        if plist and volume <= LOCAL_LAZY_POSTINGS:
+            main_lists.append(plist)
+            volume += len(plist)
+    if volume <= LOCAL_LAZY_POSTINGS:
+        if len(main_lists) == 1 and main_lists[0] is exact_list:
+            return exact, exact, meta, False
+        main = bits_from_postings(main_lists, size)
+        return (main if exact is None else exact), main, meta, False
+    main = short["main"].get(term[:LOCAL_SHORT_PREFIX], 0)
+    return (main if exact is None else exact), main, meta, True
+
+def score_local_doc(doc: dict, terms: list[str], phrase: str) -> float:
+    fields = doc["fields"]
+    score = 0.0
+    for term in terms:
+        best = 0.0
+        for field, weight in LOCAL_FIELD_WEIGHTS.items():
+            text = fields[field]
+            if f" {term} " in text:
+                m = 1.0
+            elif f" {term}" in text:
+                m = 0.6
+            elif term in text:
+                m = 0.3
+            else:
+                continue
+            if m * weight > best:
+                best = m * weight
+        score += best
+    # bonus si le titre / l'artiste commence par la requête entière
+    if fields["title"].startswith(phrase) or fields["artist"].startswith(phrase):
+        score += 1.0
+    return score
+
+def search_local_index(query: str, limit: int) -> tuple[list[dict], int, bool]:
+    """
+    Retourne (pistes classées, nombre de candidats classés, truncated).
+    Au plus LOCAL_SEARCH_CANDIDATES candidats sont classés; ils sont collectés par
+    type de match décroissant (tous les termes en token exact titre/artiste, puis
+    tous en préfixe titre/artiste, puis au moins un, puis pays/décennie), donc une
+    troncature ne retire que des matches moins bons (ou équivalents) que ceux gardés.
+    """
+    terms = list(dict.fromkeys(normalize_text(query).split()))
+    if not terms:
+        return [], 0, False
+    phrase = " " + " ".join(terms)
+
+    with local_index_lock:
+        docs = local_index["docs"]
+        candidates = {}
+        truncated = False
+        scanned = 0
+
+        # 1) tous les termes sont des préfixes de tokens: intersection des bitmaps
+        size = (local_index["next_id"] >> 3) + 1
+        per_term = [local_term_bits(t, size) for t in terms]
+        verify = [" " + t for t, bits in zip(terms, per_term) if bits[3]]
+        match = functools.reduce(lambda acc, b: acc & (b[1] | b[2]), per_term[1:], per_term[0][1] | per_term[0][2])
+        if match:
+            all_exact = functools.reduce(lambda acc, b: acc & b[0], per_term, match)
+            all_main = functools.reduce(lambda acc, b: acc & b[1], per_term, match)
+            any_main = match & functools.reduce(lambda acc, b: acc | b[1], per_term, 0)
+            seen = 0
+            for tier in (all_exact, all_main, any_main, match):
+                rest = tier & ~seen
+                seen |= tier
+                for doc_id in iter_bits(rest):
+                    scanned += 1
+                    if scanned > LOCAL_SCAN_LIMIT:
+                        truncated = True
+                        break
+                    doc = docs.get(doc_id)
+                    if doc is None:
+                        continue
+                    if verify and not all(v in doc["text"] for v in verify):
+                        continue
+                    if len(candidates) >= LOCAL_SEARCH_CANDIDATES:
+                        truncated = True
+                        break
+                    candidates[doc_id] = doc
+                if truncated:
+                    break
+
+        # 2) complète par sous-chaîne (termes >= 3 caractères): par terme, bitmap du trigramme
+        #    le plus rare en titre/artiste (sur-ensemble) | tokens pays/décennie qui contiennent
+        #    le terme, intersecté avec les termes courts
+        if not truncated and any(len(t) >= 3 for t in terms):
+            trigrams = local_index["trigrams"]["main"]
+            sub = -1
+            sub_main = 0
+            for t, bits in zip(terms, per_term):
+                if len(t) < 3:
+                    sub &= bits[1] | bits[2]
+                    continue
+                grams = trigrams_of(t)
+                main = bits_from_postings([min((trigrams.get(g, ()) for g in grams), key=len)], size)
+                meta = 0
+                for token, token_bits in local_index["meta_bits"].items():
+                    if t in token:
+                        meta |= token_bits
+                sub &= main | meta
+                sub_main |= main
+            sub &= ~match
+            needles = [t if len(t) >= 3 else " " + t for t in terms]
+            for tier in (sub & sub_main, sub & ~sub_main):
+                for doc_id in iter_bits(tier):
+                    scanned += 1
+                    if scanned > LOCAL_SCAN_LIMIT:
+                        truncated = True
+                        break
+                    doc = docs.get(doc_id)
+                    if doc is None or not all(t in doc["text"] for t in needles):
+                        continue
+                    if len(candidates) >= LOCAL_SEARCH_CANDIDATES:
+                        truncated = True
+                        break
+                    candidates[doc_id] = doc
+                if truncated:
+                    break
+
+        ranked = sorted(
+            candidates.values(),
+            key=lambda d: (-score_local_doc(d, terms, phrase), d["artist"], d["title"]),
+        )[:limit]
+        return ranked, len(candidates), truncated
+
 # --- Common API Endpoints ---
 
 @app.get("/api/state")
@@ -409,6 +1366,48 @@ def get_host_info():
         "host": socket.gethostname(),
     }
 
+# --- Local library search ---
+
+@app.get("/api/local/search")
+def local_search(q: str = "", limit: int = 20):
+    """
+    Search the local music library by artist/title/country/decade (prefix + substring).
+    `ranked` is how many matches were scored (capped); `truncated` means more matched.
+    """
+    t0 = time.perf_counter()
+    limit = max(1, min(limit, 100))
+    ranked, ranked_count, truncated = search_local_index(q, limit)
+
+    tracks = []
+    for doc in ranked:
+        p = MUSIC_DIR / doc["country"] / doc["decade"] / doc["file"]
+        tracks.append({
+            "trackId": doc["trackId"],
+            "artist": doc["artist"],
+            "title": doc["title"],
+            "country": doc["country"],
+            "decade": doc["decade"],
+            "streamUrl": doc["streamUrl"],
+            "coverUrl": cover_url_for_track(doc["country"], doc["decade"], p, {"cover": doc["cover"]}),
+        })
+    return {"tracks": tracks, "ranked": ranked_count, "truncated": truncated, "took_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
+@app.get("/api/local/index")
+def local_index_status():
+    return {
+        "tracks": len(local_index["docs"]),
+        "tokens": len(local_index["vocab"]),
+        "stale": local_index["stale"],
+        "built_at": local_index["built_at"],
+        "build_ms": local_index["build_ms"],
+    }
+
+@app.post("/api/local/reindex")
+def local_reindex():
+    """Wake the background indexer now instead of waiting for the next interval"""
+    local_indexer["wake"].set()
+    return {"ok": True}
+
 # --- Spotify Integration ---
 
 @app.get("/api/spotify/login")
@@ -487,12 +1486,12 @@ def spotify_callback(code: str = None, error: str = None):
             spotify_user_token = token_info
             spotify_client = spotipy.Spotify(auth_manager=spotify_oauth)
             
-            print(f"✓ Spotify user authenticated: {token_info}")
+            spotify_log.info("Spotify user authenticated")
             
             # Redirect to frontend with success
             return RedirectResponse(url=SPOTIFY_AUTH_SUCCESS_URL)
         except Exception as e:
-            print(f"✗ Spotify auth error: {e}")
+            spotify_log.error("Spotify auth error: %s", e)
             return JSONResponse({"error": str(e)}, status_code=400)
     
     return JSONResponse({"error": "No code provided"}, status_code=400)
@@ -528,79 +1527,111 @@ def spotify_status():
         "access_token": access_token
     })
 
+def fetch_spotify_search_page(query: str, offset: int, limit: int, access_token: str):
+    with span("spotify.search"):
+        return spotify_http.get(
+            "https://api.spotify.com/v1/search",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={"q": query, "type": "track", "limit": limit, "offset": offset},
+            timeout=10
+        )
+
 @app.post("/api/spotify/search")
 async def spotify_search(req: SpotifySearchReq):
-    """Search tracks on Spotify"""
+    """Search tracks on Spotify (pages of 10 fetched concurrently, merged in order)"""
     
     if not SPOTIFY_AVAILABLE:
         return JSONResponse({"error": "Spotify integration not available"}, status_code=503)
     
-    print(f"Search request for: '{req.query}' (limit: {req.limit})")
-    
     client = get_spotify_client()
     if not client:
-        print("No Spotify client - user not authenticated")
+        search_log.info("No Spotify client - user not authenticated")
         return JSONResponse({"error": "Not authenticated with Spotify"}, status_code=401)
     
     try:
-        # Spotify API limit: max 10 per search query for this API access level
         limit = req.limit if req.limit else 10
         try:
             limit = int(limit)
-            limit = max(1, min(limit, 10))  # Cap at 10 due to Spotify API restrictions
+            limit = max(1, min(limit, SPOTIFY_SEARCH_MAX_RESULTS))
         except (ValueError, TypeError):
             limit = 10
+        try:
+            offset = max(0, int(req.offset or 0))
+        except (ValueError, TypeError):
+            offset = 0
         
-        # Use requests directly
         token = spotify_oauth.get_cached_token()
         if not token or "access_token" not in token:
             return JSONResponse({"error": "Token expired or invalid"}, status_code=401)
         
         access_token = token["access_token"]
-        headers = {"Authorization": f"Bearer {access_token}"}
-        
-        params = {
-            "q": req.query,
-            "type": "track",
-            "limit": limit
-        }
-        
-        print(f"Searching with limit={limit}")
         
-        import requests as req_lib
-        response = req_lib.get(
-            "https://api.spotify.com/v1/search",
-            headers=headers,
-            params=params,
-            timeout=10
-        )
-        
-        if response.status_code != 200:
-            print(f"Spotify API error: {response.text}")
-            return JSONResponse({"error": f"Spotify API error: {response.text}"}, status_code=response.status_code)
+        # Spotify API limit: max 10 per search query for this API access level
+        pages = [
+            (page_offset, min(SPOTIFY_SEARCH_PAGE_SIZE, offset + limit - page_offset))
+            for page_offset in range(offset, offset + limit, SPOTIFY_SEARCH_PAGE_SIZE)
+        ]
+        responses = await asyncio.gather(*[
+            asyncio.to_thread(fetch_spotify_search_page, req.query, page_offset, page_limit, access_token)
+            for page_offset, page_limit in pages
+        ], return_exceptions=True)
         
-        results = response.json()
-        print(f"Found {len(results.get('tracks', {}).get('items', []))} tracks")
+        first = responses[0]
+        if isinstance(first, Exception):
+            raise first
+        if first.status_code != 200:
+            search_log.warning("Spotify API error %s: %s", first.status_code, first.text)
+            return JSONResponse({"error": f"Spotify API error: {first.text}"}, status_code=first.status_code)
         
+        # Merge in page order; a failed page truncates the result so it stays contiguous
         tracks = []
-        for item in results.get("tracks", {}).get("items", []):
-            track = {
-                "id": item["id"],
-                "uri": item["uri"],
-                "name": item["name"],
-                "artist": ", ".join([a["name"] for a in item.get("artists", [])]),
-                "album": item.get("album", {}).get("name", ""),
-                "image": item.get("album", {}).get("images", [{}])[0].get("url", ""),
-                "duration_ms": item.get("duration_ms", 0),
-                "preview_url": item.get("preview_url", "")
-            }
-            tracks.append(track)
+        seen = set()
+        total = 0
+        partial = False
+        for response in responses:
+            if isinstance(response, Exception) or response.status_code != 200:
+                partial = True
+                search_log.warning(
+                    "Spotify search page failed: %s",
+                    response if isinstance(response, Exception) else response.status_code,
+                )
+                break
+            results = response.json().get("tracks", {})
+            total = results.get("total", total)
+            items = results.get("items", [])
+            for item in items:
+                if not item or item["id"] in seen:
+                    continue
+                seen.add(item["id"])
+                track = {
+                    "id": item["id"],
+                    "uri": item["uri"],
+                    "name": item["name"],
+                    "artist": ", ".join([a["name"] for a in item.get("artists", [])]),
+                    "album": item.get("album", {}).get("name", ""),
+                    "image": item.get("album", {}).get("images", [{}])[0].get("url", ""),
+                    "duration_ms": item.get("duration_ms", 0),
+                    "preview_url": item.get("preview_url", "")
+                }
+                tracks.append(track)
+            if len(items) < SPOTIFY_SEARCH_PAGE_SIZE:
+                break
+        
+        search_log.info(
+            "Spotify search",
+            extra={"fields": {
+                "query": req.query,
+                "limit": limit,
+                "offset": offset,
+                "pages": len(pages),
+                "found": len(tracks),
+                "partial": partial,
+            }},
+        )
         
-        return {"tracks": tracks}
+        return {"tracks": tracks, "offset": offset, "total": total, "partial": partial}
     except Exception as e:
-        print(f"Search error: {e}")
-        import traceback
-        traceback.print_exc()
+        search_log.exception("Search error: %s", e)
         return JSONResponse({"error": f"Search failed: {str(e)}"}, status_code=500)
 
 @app.post("/api/spotify/play")
@@ -752,6 +1783,87 @@ async def dev_next():
     set_track_from_fs(state["country"], state["decade"])
     await broadcast({"type": "state", "state": state})
 
+# --- Admin: profiling
+# Si GLOBE_ADMIN_TOKEN est défini, il faut l'envoyer dans le header X-Admin-Token,
+# sinon ces endpoints ne répondent qu'en local (127.0.0.1 / ::1).
+
+@app.get("/api/admin/profiling")
+def get_profiling(request: Request, x_admin_token: str | None = Header(None)):
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    return {
+        **profiling,
+        "traces": len(slow_traces),
+        "sampler": {
+            "running": sampler["thread"] is not None,
+            "interval_ms": sampler["interval_ms"],
+            "samples": sampler["count"],
+            "started_at": sampler["started_at"],
+        },
+        "log_dropped": log_drop_counts(),
+    }
+
+@app.post("/api/admin/profiling")
+def set_profiling(request: Request, req: ProfilingReq, x_admin_token: str | None = Header(None)):
+    """Toggle per-request span timing and/or change the slow-request threshold"""
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    if req.spans is not None:
+        profiling["spans"] = req.spans
+    if req.slow_ms is not None:
+        profiling["slow_ms"] = max(0.0, req.slow_ms)
+    return {"ok": True, **profiling}
+
+@app.get("/api/admin/traces")
+def get_slow_traces(request: Request, clear: bool = False, x_admin_token: str | None = Header(None)):
+    """Download the slow-request span trees (most recent last)"""
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    traces = list(slow_traces)
+    if clear:
+        slow_traces.clear()
+    return JSONResponse(
+        {"slow_ms": profiling["slow_ms"], "traces": traces},
+        headers={"Content-Disposition": 'attachment; filename="globe-traces.json"'},
+    )
+
+@app.post("/api/admin/profiler/start")
+def profiler_start(request: Request, interval_ms: float = 5.0, x_admin_token: str | None = Header(None)):
+    """Start the sampling profiler (resets previous samples)"""
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    interval_ms = max(1.0, min(interval_ms, 1000.0))
+    if not start_sampler(interval_ms):
+        return JSONResponse({"error": "profiler already running"}, status_code=409)
+    return {"ok": True, "interval_ms": interval_ms}
+
+@app.post("/api/admin/profiler/stop")
+def profiler_stop(request: Request, x_admin_token: str | None = Header(None)):
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    if not stop_sampler():
+        return JSONResponse({"error": "profiler not running"}, status_code=409)
+    return {"ok": True, "samples": sampler["count"]}
+
+@app.get("/api/admin/profiler")
+def profiler_dump(request: Request, x_admin_token: str | None = Header(None)):
+    """Download collected samples in collapsed-stack format ("frame;frame;frame count")"""
+    denied = admin_denied(request, x_admin_token)
+    if denied:
+        return denied
+    with sampler_lock:
+        samples = sampler["samples"].most_common()
+    body = "\n".join(f"{stack} {count}" for stack, count in samples)
+    return PlainTextResponse(
+        body + "\n" if body else "",
+        headers={"Content-Disposition": 'attachment; filename="globe-profile.folded"'},
+    )
+
 @app.websocket("/ws")
 async def ws(ws: WebSocket):
     await ws.accept()